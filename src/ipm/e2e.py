@@ -36,18 +36,30 @@ Implementation of Gherkin steps::
 
 from __future__ import annotations
 
+import atexit
+from collections import deque
 from collections.abc import ByteString
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import chain
 from pathlib import Path
+import os
 import random
 import re
 import subprocess
 import sys
 import time
 from typing import Any, AnyStr, Callable, Iterable, Iterator, NamedTuple, Optional, Protocol, TypeVar, Union
+from weakref import WeakKeyDictionary
+
+try:
+    from re import _parser as sre_parse
+except ImportError: # python < 3.11
+    import sre_parse
 
 import gi
 gi.require_version('Atspi', '2.0')
-from gi.repository import Atspi
+from gi.repository import Atspi, Gio, GLib
 
 __all__ = [
     'perform_on',
@@ -56,7 +68,9 @@ __all__ = [
     'find_all_objs',
     'obj_get_attr',
     'obj_children',
+    'obj_children_iter',
     'tree_walk',
+    'traversal_cache',
     'run',
     'is_error',
     'fail_on_error',
@@ -125,21 +139,182 @@ def fail_on_error(x: Either[Any]) -> Any:
     return x
 
     
+class _AttrCache:
+    """Values fetched from at-spi objects, kept during one traversal.
+
+    Every query to an at-spi object is a DBus call. While searching,
+    the same attributes (role, name, children, ...) of the same object
+    are queried once and again, so we keep them here.
+
+    The entries are keyed by the `id` of the object. The object itself
+    is also stored, so it lives, and its `id` can't be reused, as long
+    as the cache does.
+
+    """
+    
+    def __init__(self) -> None:
+        self._entries: dict[int, tuple[Atspi.Object, dict[str, Any]]] = {}
+
+    def get(self, obj: Atspi.Object, key: str, fetch: Callable[[], T]) -> T:
+        entry = self._entries.get(id(obj))
+        if entry is None:
+            entry = self._entries[id(obj)] = (obj, {})
+        values = entry[1]
+        if key not in values:
+            values[key] = fetch()
+        return values[key]
+
+
+_attr_cache: Optional[_AttrCache] = None
+
+
+@contextmanager
+def traversal_cache() -> Iterator[None]:
+    """Caches the values fetched from at-spi objects within the block.
+
+    Nested blocks share the cache of the outermost one. Once the
+    outermost block is left, the cache is discarded, so the next
+    traversal will see the current state of the user interface.
+
+    """
+    
+    global _attr_cache
+    if _attr_cache is not None:
+        yield
+        return
+    _attr_cache = _AttrCache()
+    try:
+        yield
+    finally:
+        _attr_cache = None
+
+
+def _cached(obj: Atspi.Object, key: str, fetch: Callable[[], T]) -> T:
+    cache = _attr_cache
+    if cache is None:
+        return fetch()
+    return cache.get(obj, key, fetch)
+
+
+# Conexión propia con el bus de accesibilidad, para hacer llamadas
+# que libatspi no ofrece.
+#
+# NB: libatspi también busca la dirección del bus en la propiedad
+# `AT_SPI_BUS` de la ventana raíz de X11. Aquí sólo miramos
+# `AT_SPI_BUS_ADDRESS` y `org.a11y.Bus.GetAddress`, así que podemos
+# acabar en un bus distinto. En ese caso las llamadas fallan, la
+# aplicación se marca en `_props_unsupported` y volvemos a las
+# funciones de at-spi.
+_a11y_bus_conn: Optional[Gio.DBusConnection] = None
+
+# Si no conseguimos conectar, no lo reintentamos hasta pasado un rato
+# para no pagar el intento fallido en cada nodo.
+_a11y_bus_failed_at: Optional[float] = None
+
+_A11Y_BUS_RETRY = 5 # s
+
+
+def _a11y_bus() -> Optional[Gio.DBusConnection]:
+    global _a11y_bus_conn, _a11y_bus_failed_at
+    if _a11y_bus_conn is not None and not _a11y_bus_conn.is_closed():
+        return _a11y_bus_conn
+    if _a11y_bus_failed_at is not None and time.monotonic() - _a11y_bus_failed_at < _A11Y_BUS_RETRY:
+        return None
+    try:
+        address = os.environ.get('AT_SPI_BUS_ADDRESS')
+        if not address:
+            session = Gio.bus_get_sync(Gio.BusType.SESSION, None)
+            reply = session.call_sync('org.a11y.Bus', '/org/a11y/bus', 'org.a11y.Bus', 'GetAddress',
+                                      None, GLib.VariantType('(s)'),
+                                      Gio.DBusCallFlags.NONE, -1, None)
+            address = reply.unpack()[0]
+        flags = (Gio.DBusConnectionFlags.AUTHENTICATION_CLIENT |
+                 Gio.DBusConnectionFlags.MESSAGE_BUS_CONNECTION)
+        _a11y_bus_conn = Gio.DBusConnection.new_for_address_sync(address, flags, None, None)
+        _a11y_bus_failed_at = None
+        return _a11y_bus_conn
+    except GLib.Error:
+        _a11y_bus_conn = None
+        _a11y_bus_failed_at = time.monotonic()
+        return None
+
+
+# Aplicaciones (nombre en el bus) que no soportan `GetAll`. No
+# volvemos a intentarlo con ningún otro objeto de esas aplicaciones.
+_props_unsupported: set[str] = set()
+
+# Errores que indican que la aplicación no soporta la llamada (o que
+# no está en nuestro bus). Otros errores, p.e. un timeout, pueden ser
+# pasajeros y no marcan la aplicación.
+_PROPS_UNSUPPORTED_ERRORS = (
+    Gio.DBusError.UNKNOWN_METHOD,
+    Gio.DBusError.UNKNOWN_INTERFACE,
+    Gio.DBusError.UNKNOWN_PROPERTY,
+    Gio.DBusError.NOT_SUPPORTED,
+    Gio.DBusError.SERVICE_UNKNOWN,
+)
+
+# El mismo timeout que usa libatspi por defecto en sus llamadas.
+_PROPS_CALL_TIMEOUT = 800 # ms
+
+
+def _fetch_props(obj: Atspi.Object) -> dict[str, Any]:
+    # Una sola llamada DBus nos trae todas las propiedades del objeto
+    # (Name, ChildCount, ...). Si algo falla devolvemos un dict vacío
+    # y se usan las funciones de at-spi de siempre.
+    try:
+        bus_name, path = obj.app.bus_name, obj.path
+    except AttributeError:
+        return {}
+    if not bus_name or not path or bus_name in _props_unsupported:
+        return {}
+    bus = _a11y_bus()
+    if bus is None:
+        return {}
+    try:
+        reply = bus.call_sync(bus_name, path,
+                              'org.freedesktop.DBus.Properties', 'GetAll',
+                              GLib.Variant('(s)', ('org.a11y.atspi.Accessible',)),
+                              GLib.VariantType('(a{sv})'),
+                              Gio.DBusCallFlags.NONE, _PROPS_CALL_TIMEOUT, None)
+    except GLib.Error as error:
+        if any(error.matches(Gio.DBusError.quark(), code) for code in _PROPS_UNSUPPORTED_ERRORS):
+            _props_unsupported.add(bus_name)
+        return {}
+    except TypeError:
+        _props_unsupported.add(bus_name)
+        return {}
+    return reply.unpack()[0]
+
+
+def _get_prop(obj: Atspi.Object, prop: str, fetch: Callable[[], T]) -> T:
+    # Fuera de un recorrido consultamos sólo lo que nos piden. Dentro,
+    # traemos todas las propiedades de una vez porque vamos a
+    # necesitar varias.
+    cache = _attr_cache
+    if cache is None:
+        return fetch()
+    props = cache.get(obj, 'props', lambda: _fetch_props(obj))
+    return props[prop] if prop in props else fetch()
+
+
 def _pprint(obj: Atspi.Object) -> str:
-    role = obj.get_role_name()
-    name = obj.get_name() or ""
+    role = obj_get_attr(obj, 'role')
+    name = obj_get_attr(obj, 'name')
     return f"{role} ({name})"
 
 
-def _get_action_idx(obj: Atspi.Object, name: str) -> Optional[int]:
-    for i in range(obj.get_n_actions()):
-        if obj.get_action_name(i) == name:
-            return i
-    return None
+_actions_cache: WeakKeyDictionary[Atspi.Object, dict[str, int]] = WeakKeyDictionary()
 
 
-def _get_actions_names(obj: Atspi.Object) -> list[str]:
-    return [ obj.get_action_name(i) for i in range(obj.get_n_actions()) ]
+def _actions_by_name(obj: Atspi.Object) -> dict[str, int]:
+    # Las acciones de un widget no cambian, así que sólo las
+    # consultamos la primera vez que hacemos algo sobre él.
+    actions = _actions_cache.get(obj)
+    if actions is None:
+        actions = { obj.get_action_name(i): i for i in range(obj.get_n_actions()) }
+        _actions_cache[obj] = actions
+    return actions
 
 
 def obj_get_attr(obj: Atspi.Object, name:str) -> Either[str]:
@@ -165,11 +340,11 @@ def obj_get_attr(obj: Atspi.Object, name:str) -> Either[str]:
     """
     
     if name == 'role':
-        return obj.get_role_name()
+        return _cached(obj, 'role', obj.get_role_name)
     elif name == 'name':
-        return obj.get_name() or ""
+        return _cached(obj, 'name', lambda: _get_prop(obj, 'Name', obj.get_name) or "")
     elif name == 'text':
-        return obj.get_text(0, -1)
+        return _cached(obj, 'text', lambda: obj.get_text(0, -1))
     elif hasattr(obj, name):
         return getattr(obj, name)
     elif hasattr(obj, f"get_{name}"):
@@ -178,27 +353,24 @@ def obj_get_attr(obj: Atspi.Object, name:str) -> Either[str]:
         return AttributeError(f"{_pprint(obj)} has no attribute {name}")
     
 
-# Cuando buscamos todos los valores son strings aunque el tipo del
-# atributo sea un Enum.
-# Podríamos intentar usar el valor, p.e.:
+# El rol se puede buscar por su nombre (el de `get_role_name`) o por
+# el valor del Enum, p.e.:
 # ```python
-# from e2e import role
-# do('click', role= role.BUTTON, name= _('Count'))
+# do('click', role= Atspi.Role.PUSH_BUTTON, name= _('Count'))
 # ```
 #
-# Eso nos obligaría a cargar las definiciones de los Enums al cargar
-# el módulo, o hacerlo _on-the-fly_ con una cache.
+# Los nombres se traducen al Enum con `_ROLE_NAME_TO_ENUM`, que se
+# construye al cargar el módulo.
 #
-# Ahora mismo, cuando una búsqueda falla. Revisamos los valores de los
-# attributos que en realidad son de tipo Enum para ver si no está en
-# la lista y poder dar un mensaje de error más útil.
+# Cuando una búsqueda falla, revisamos los valores de los atributos
+# que en realidad son de tipo Enum para ver si no están en la lista y
+# poder dar un mensaje de error más útil.
 #
-# TODO: decidir si implementar la primera opción.
 # TODO: añadir más casos a la función
 def _help_not_found(kwargs) -> str:
     msg = ""
     role = kwargs.get('role', None)
-    if role and role.upper() not in Atspi.Role.__dict__:
+    if type(role) == str and _role_from_name(role) is None:
         msg = f"{msg}\n{role} is not a role name"
     return msg
 
@@ -230,7 +402,7 @@ Each pair ``name: value`` is interpreted as follows:
         siblings. As usual the positions start at 0, and negative
         indexes are refered to the end of the list.
 
-    **name = 'path':** TODO
+    **name = 'path':** Not supported yet, it raises a ``ValueError``.
 
     **name = '...':** Otherwise, one of the object's atrributes.
 
@@ -251,49 +423,231 @@ Each pair ``name: value`` is interpreted as follows:
                 The function must return True when called with the
                 object's attribute value as argument.
 
+            **value = Atspi.Role:** A role, only when the name is ``role``.
+
+                The object's role must be the given one, e.g.
+                ``role= Atspi.Role.PUSH_BUTTON``. It's equivalent to
+                ``role= 'push button'``.
+
 """
 
+# Tipos de patrón. Se calculan una vez por búsqueda, así no volvemos a
+# mirar el tipo del valor en cada nodo.
+_PATTERN_STR = 0
+_PATTERN_RE = 1
+_PATTERN_CALLABLE = 2
+_PATTERN_NTH = 3
+_PATTERN_WHEN = 4
+_PATTERN_ROLE = 5
+
+
 # TODO: Parámetro `path` el valor puede incluir patrones. Hay que ver
 # qué lenguaje usamos. Tiene que machear con el path desde el root
 # hasta el widget.  ¿ Nos interesa incluir otros atributos además de
 # la posición dentro de los siblings ?
-def _match(obj: Atspi.Object, path: TreePath, name: str, value: Any) -> bool:
+def _pattern_kind(name: str, value: Any) -> int:
     if name == 'path':
-        TODO
-        
+        raise ValueError("'path' patterns are not supported")
     elif name == 'nth':
-        nth_of = path[-1]
-        idx = value if value >= 0 else nth_of.n + value
-        return idx == nth_of.i
-    
+        return _PATTERN_NTH
     elif name == 'when':
-        return value(obj, path)
-    
+        return _PATTERN_WHEN
+    elif name == 'role' and isinstance(value, Atspi.Role):
+        return _PATTERN_ROLE
     # From now on, the name is the name of an object's attribute
     elif type(value) == str or isinstance(value, ByteString):
-        return obj_get_attr(obj, name) == value
-    
+        return _PATTERN_STR
     elif type(value) == re.Pattern:
-        attr_value = obj_get_attr(obj, name)
-        if is_error(attr_value):
-            return False
-        return value.fullmatch(attr_value) is not None
-    
+        return _PATTERN_RE
     elif callable(value):
-        return value(obj_get_attr(obj, name))
-    
+        return _PATTERN_CALLABLE
     # It looks like an error
     else:
-        TODO
+        raise TypeError(f"invalid pattern {name}= {value!r}")
+
+
+_ROLE_NAME_TO_ENUM: dict[str, Atspi.Role] = { Atspi.role_get_name(role): role
+                                               for role in Atspi.Role.__enum_values__.values() }
+
+
+def _role_from_name(role_name: str) -> Optional[Atspi.Role]:
+    return _ROLE_NAME_TO_ENUM.get(role_name)
+
+
+def _collection_matches(root: Atspi.Object, role: Atspi.Role) -> Optional[list[Atspi.Object]]:
+    collection = root.get_collection_iface()
+    if collection is None:
+        return None
+    rule = Atspi.MatchRule.new(Atspi.StateSet.new([]), Atspi.CollectionMatchType.ALL,
+                               {}, Atspi.CollectionMatchType.ALL,
+                               [role], Atspi.CollectionMatchType.ANY,
+                               [], Atspi.CollectionMatchType.ALL,
+                               False)
+    try:
+        matches = collection.get_matches(rule, Atspi.CollectionSortOrder.CANONICAL, 0, True)
+    except GLib.Error:
+        return None
+    # Dependiendo de la implementación, el root puede estar o no entre
+    # los resultados. Lo quitamos y lo añadimos nosotros para respetar
+    # el orden de `tree_walk`.
+    matches = [ obj for obj in matches if obj != root ]
+    if _cached(root, 'role_enum', root.get_role) == role:
+        matches.insert(0, root)
+    return matches
+
+
+def _role_pattern(value: Any) -> Any:
+    # Comparar el enum es más barato que traer el nombre del rol y
+    # comparar strings.
+    if type(value) == str:
+        role = _role_from_name(value)
+        if role is not None:
+            return role
+    return value
+
+
+# Coste aproximado de comprobar cada patrón. Los baratos y más
+# selectivos se comprueban primero, así descartamos el objeto antes
+# de hacer las llamadas DBus más caras (p.e. `get_text`).
+_PREDICATE_COST = {
+    'role': 0,
+    'name': 10,
+    'nth': 20,
+    'text': 30,
+    'when': 100,
+}
+
+_KIND_COST = {
+    _PATTERN_STR: 0,
+    _PATTERN_ROLE: 0,
+    _PATTERN_NTH: 0,
+    _PATTERN_RE: 5,
+    _PATTERN_CALLABLE: 10,
+    _PATTERN_WHEN: 10,
+}
+
+
+def _literal_prefix(pattern: re.Pattern) -> tuple[list[int], list]:
+    items = list(sre_parse.parse(pattern.pattern, pattern.flags))
+    if items and items[0] == (sre_parse.AT, sre_parse.AT_BEGINNING):
+        # Con `fullmatch` el `^` inicial no aporta nada
+        items = items[1:]
+    n = 0
+    while n < len(items) and items[n][0] == sre_parse.LITERAL:
+        n += 1
+    return [ value for _op, value in items[:n] ], items[n:]
+
+
+def _is_dot_star(items: list) -> bool:
+    if len(items) != 1:
+        return False
+    op, args = items[0]
+    return (op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and
+            args[0] == 0 and args[1] == sre_parse.MAXREPEAT and
+            list(args[2]) == [(sre_parse.ANY, None)])
+
+
+def _re_matcher(pattern: re.Pattern) -> Callable[[AnyStr], Any]:
+    # Muchos patrones son del tipo `^literal.*`. Para esos no hace
+    # falta el motor de expresiones regulares, basta con `startswith`.
+    # Si el patrón empieza por un literal pero sigue con algo más
+    # complicado, usamos el prefijo para descartar rápido.
+    fullmatch = pattern.fullmatch
+    if pattern.flags & (re.IGNORECASE | re.LOCALE):
+        return fullmatch
+    try:
+        chars, rest = _literal_prefix(pattern)
+    except (sre_parse.error, TypeError, ValueError):
+        return fullmatch
+    if isinstance(pattern.pattern, str):
+        prefix, newline = "".join(map(chr, chars)), "\n"
+    else:
+        prefix, newline = bytes(chars), b"\n"
+
+    if len(rest) == 0:
+        return lambda value: value == prefix
+    elif _is_dot_star(rest):
+        if pattern.flags & re.DOTALL:
+            return lambda value: value.startswith(prefix)
+        n = len(prefix)
+        return lambda value: value.startswith(prefix) and newline not in value[n:]
+    elif prefix:
+        return lambda value: value.startswith(prefix) and fullmatch(value)
+    else:
+        return fullmatch
+
+
+# Generamos el código de la función que comprueba los patrones. Así,
+# en cada nodo se ejecuta una secuencia de `if`s sin bucles ni
+# llamadas a funciones intermedias. El código sólo depende de los
+# nombres y tipos de los patrones, no de sus valores, de modo que se
+# reutiliza entre búsquedas.
+def _pattern_check(name: str, kind: int, v: str) -> list[str]:
+    if kind == _PATTERN_ROLE:
+        return [f"if _cached(obj, 'role_enum', obj.get_role) != {v}: return False"]
+    elif kind == _PATTERN_STR:
+        return [f"if obj_get_attr(obj, {name!r}) != {v}: return False"]
+    elif kind == _PATTERN_RE:
+        return [f"attr_value = obj_get_attr(obj, {name!r})",
+                f"if is_error(attr_value) or not {v}(attr_value): return False"]
+    elif kind == _PATTERN_CALLABLE:
+        return [f"if not {v}(obj_get_attr(obj, {name!r})): return False"]
+    elif kind == _PATTERN_NTH:
+        return ["nth_of = path[-1]",
+                f"if ({v} if {v} >= 0 else nth_of.n + {v}) != nth_of.i: return False"]
+    elif kind == _PATTERN_WHEN:
+        return [f"if not {v}(obj, path): return False"]
+    else:
+        raise ValueError(f"unknown pattern kind {kind}")
+
+
+@lru_cache(maxsize=128)
+def _plan_factory(shape: tuple[tuple[str, int], ...]) -> Callable[..., Callable[[Atspi.Object, TreePath], bool]]:
+    params = [ f"v{i}" for i in range(len(shape)) ]
+    lines = [ f"def make({', '.join(params)}):",
+              "    def plan(obj, path):" ]
+    for (name, kind), v in zip(shape, params):
+        lines.extend(f"        {line}" for line in _pattern_check(name, kind, v))
+    lines.extend([ "        return True",
+                   "    return plan" ])
+    namespace = { '_cached': _cached, 'obj_get_attr': obj_get_attr, 'is_error': is_error }
+    exec("\n".join(lines), namespace)
+    return namespace['make']
+
+
+def _compile_plan(patterns: Iterable[tuple[str, Any]]) -> Callable[[Atspi.Object, TreePath], bool]:
+    kinds = [ (name, value, _pattern_kind(name, value)) for name, value in patterns ]
+    kinds.sort(key= lambda p: _PREDICATE_COST.get(p[0], 50) + _KIND_COST[p[2]])
+    make = _plan_factory(tuple((name, kind) for name, _value, kind in kinds))
+    return make(*(_re_matcher(value) if kind == _PATTERN_RE else value
+                  for _name, value, kind in kinds))
+
+
+# Patrones que necesitan el path del objeto. No se pueden comprobar
+# sobre los resultados del interface `Collection`.
+_PATH_PATTERNS = frozenset(('nth', 'path', 'when'))
 
 
 def _find_all_descendants(root: Atspi.Object, kwargs: MatchArgs) -> Iterable[Atspi.Object]:
     if len(kwargs) == 0:
-        descendants = (obj for _path, obj in tree_walk(root))
-    else:
-        descendants = (obj for path, obj in tree_walk(root)
-                       if all(_match(obj, path, name, value) for name, value in kwargs.items()))
-    return descendants
+        return (obj for _path, obj in tree_walk(root, with_paths= False))
+
+    # Si hay un rol, le pedimos a at-spi todos los objetos con ese rol
+    # en una única llamada DBus, en lugar de recorrer nosotros el
+    # árbol, y sólo comprobamos el resto de patrones.
+    role = _role_pattern(kwargs.get('role', None))
+    if isinstance(role, Atspi.Role) and _PATH_PATTERNS.isdisjoint(kwargs):
+        candidates = _collection_matches(root, role)
+        if candidates is not None:
+            match = _compile_plan((name, value) for name, value in kwargs.items()
+                                  if name != 'role')
+            return (obj for obj in candidates if match(obj, None))
+
+    match = _compile_plan((name, _role_pattern(value) if name == 'role' else value)
+                          for name, value in kwargs.items())
+    with_paths = not _PATH_PATTERNS.isdisjoint(kwargs)
+    return (obj for path, obj in tree_walk(root, with_paths= with_paths)
+            if match(obj, path))
 
     
 def find_obj(root: Atspi.Object, **kwargs: MatchArgs) -> Either[Atspi.Object]:
@@ -324,12 +678,13 @@ def find_obj(root: Atspi.Object, **kwargs: MatchArgs) -> Either[Atspi.Object]:
     if len(kwargs) == 0:
         return root
     else:
-        obj = next(_find_all_descendants(root, kwargs), None)
-        if obj is None:
-            help_msg = _help_not_found(kwargs)
-            return NotFoundError(f"no widget from {_pprint(root)} with {kwargs} {help_msg}") 
-        else:
-            return obj
+        with traversal_cache():
+            obj = next(_find_all_descendants(root, kwargs), None)
+            if obj is None:
+                help_msg = _help_not_found(kwargs)
+                return NotFoundError(f"no widget from {_pprint(root)} with {kwargs} {help_msg}") 
+            else:
+                return obj
 
     
 def find_all_objs(roots: Union[Atspi.Object, Iterable[Atspi.Object]], **kwargs: MatchArgs) -> list[Atspi.Object]:
@@ -361,14 +716,13 @@ def find_all_objs(roots: Union[Atspi.Object, Iterable[Atspi.Object]], **kwargs:
     
     if isinstance(roots, Atspi.Object):
         roots = [roots]
-    result = []
-    if len(kwargs) == 0:
-        for root in roots:
-            result.extend(obj for _path, obj in tree_walk(root))
-    else:
-        for root in roots:
-            result.extend(_find_all_descendants(root, kwargs))
-    return result
+    # Las búsquedas desde cada root se hacen una detrás de otra. No las
+    # repartimos en threads: libatspi no es thread-safe (la conexión
+    # DBus y sus caches son compartidas y sin locks), y la cache del
+    # recorrido tampoco.
+    with traversal_cache():
+        return list(chain.from_iterable(_find_all_descendants(root, kwargs)
+                                        for root in roots))
 
 
 def obj_children(obj: Atspi.Object) -> list[Atspi.Object]:
@@ -385,7 +739,28 @@ def obj_children(obj: Atspi.Object) -> list[Atspi.Object]:
         The list of object's children.
     """
     
-    return [ obj.get_child_at_index(i) for i in range(obj.get_child_count()) ]
+    return _cached(obj, 'children', lambda: list(obj_children_iter(obj)))
+
+
+def obj_children_iter(obj: Atspi.Object) -> Iterator[Atspi.Object]:
+    """Iterates over the children of an at-spi object.
+
+    Unlike :py:func:`obj_children`, each child is queried only when
+    the iterator reaches it.
+
+    Parameters
+    ----------
+    obj : Atspi.Object
+        The object whose children will be queried.
+
+    Yields
+    ------
+    Atspi.Object
+        The object's children.
+    """
+    
+    for i in range(_get_prop(obj, 'ChildCount', obj.get_child_count)):
+        yield obj.get_child_at_index(i)
 
 
 class NthOf(NamedTuple):
@@ -405,7 +780,8 @@ TreePath = tuple[NthOf, ...]
 ROOT_TREE_PATH = (NthOf(0, 1),)
 
 
-def tree_walk(root: Atspi.Object, path: TreePath= ROOT_TREE_PATH) -> Iterator[tuple[TreePath, Atspi.Object]]:
+def tree_walk(root: Atspi.Object, path: TreePath= ROOT_TREE_PATH,
+              with_paths: bool= True) -> Iterator[tuple[Optional[TreePath], Atspi.Object]]:
     """Creates a tree traversal.
 
     This function performs an inorder tree traversal, starting at the
@@ -423,6 +799,11 @@ def tree_walk(root: Atspi.Object, path: TreePath= ROOT_TREE_PATH) -> Iterator[tu
     path : TreePath, optional
         A prefix for the paths yielded.
 
+    with_paths : bool, optional
+        Whether to build the paths. When False, the paths yielded are
+        None. Use it when the paths aren't needed, to save the cost
+        of building them.
+
     Yields
     ------
     (TreePath, Atspi.Object)
@@ -430,11 +811,21 @@ def tree_walk(root: Atspi.Object, path: TreePath= ROOT_TREE_PATH) -> Iterator[tu
 
     """
     
-    yield path, root
-    children = obj_children(root)
-    n_children = len(children)
-    for i, child in enumerate(children):
-        yield from tree_walk(child, path= path + (NthOf(i,n_children),))
+    # Recorrido iterativo con una pila explícita: evitamos un frame de
+    # python por nodo y el RecursionError en árboles muy profundos.
+    stack = deque([(path if with_paths else None, root)])
+    pop, push = stack.pop, stack.extend
+    while stack:
+        path, obj = pop()
+        yield path, obj
+        children = obj_children(obj)
+        # Los hijos se apilan en orden inverso para mantener el orden
+        # del recorrido.
+        if with_paths:
+            n = len(children)
+            push([ (path + (NthOf(i, n),), children[i]) for i in range(n-1, -1, -1) ])
+        else:
+            push([ (None, child) for child in reversed(children) ])
 
 
 # El nombre de la acción es un parámetro porque hay acciones con
@@ -456,15 +847,15 @@ UIEachShows = Callable[..., Iterator[bool]]
 UIMultipleInteraction = tuple[UserForeachDo, UIEachShows]
 
 
-def _as_iterable(objs: Obj_S) -> Iterable[Atspi.Object]:
+def _as_iterable(objs: Union[Atspi.Object, Iterable[Atspi.Object]]) -> Iterable[Atspi.Object]:
     return (objs,) if isinstance(objs, Atspi.Object) else objs
     
                
 def _do(obj: Atspi.Object, action_name: str) -> None:
-    idx = _get_action_idx(obj, action_name)
+    actions = _actions_by_name(obj)
+    idx = actions.get(action_name)
     if idx is None:
-        names = _get_actions_names(obj)
-        raise NotFoundError(f"widget {_pprint(obj)} has no action named '{name}', got: {','.join(names)}")
+        raise NotFoundError(f"widget {_pprint(obj)} has no action named '{action_name}', got: {','.join(actions)}")
     obj.do_action(idx)
 
     
@@ -538,7 +929,7 @@ def perform_on(root: Atspi.Object, **kwargs: MatchArgs) -> UIInteraction:
     return (do, shows)
 
 
-def perform_on_each(roots: Iterable[Atspi.Object], **kwargs: MatchArgs) -> UIMultipleInteraction:
+def perform_on_each(roots: Union[Atspi.Object, Iterable[Atspi.Object]], **kwargs: MatchArgs) -> UIMultipleInteraction:
     """Constructs functions that interact with some parts of the user interface.
 
     This function is similar to :py:func:`perform_on`, but instead of
@@ -600,7 +991,7 @@ def perform_on_each(roots: Iterable[Atspi.Object], **kwargs: MatchArgs) -> UIMul
     """
 
     on_objs = [ fail_on_error(find_obj(root, **kwargs))
-                for root in roots ]
+                for root in _as_iterable(roots) ]
 
     def do(action_name: str, **kwargs) -> None:
         for on_obj in on_objs:
@@ -616,25 +1007,119 @@ def perform_on_each(roots: Iterable[Atspi.Object], **kwargs: MatchArgs) -> UIMul
 
 
 ###########################################################################
+def _find_app(desktop: Atspi.Object, name: str) -> Optional[Atspi.Object]:
+    gen = (child for child in obj_children_iter(desktop)
+           if child and child.get_name() == name)
+    return next(gen, None)
+
+
+_APP_ADDED_EVENT = "object:children-changed:add"
+
+_APP_POLL_INTERVAL = 600 # ms
+
+
 def _wait_for_app(name: str, timeout: Optional[float]= None) -> Optional[Atspi.Object]:
+    # Esperamos a que at-spi nos avise de que se ha añadido una
+    # aplicación, pero seguimos consultando el desktop cada cierto
+    # tiempo: la aplicación puede registrarse antes de tener nombre, y
+    # entonces no llega ningún otro evento.
     desktop = Atspi.get_desktop(0)
-    start = time.time()
+    loop = GLib.MainLoop()
     app = None
-    timeout = timeout or 5
-    while app is None and (time.time() - start) < timeout:
-        gen = (child for child in obj_children(desktop)
-               if child and child.get_name() == name)
-        app = next(gen, None)
+    polling = True
+    timed_out = False
+
+    def check() -> bool:
+        nonlocal app
+        if app is None:
+            app = _find_app(desktop, name)
+            if app is not None:
+                loop.quit()
+        return app is None
+
+    def on_app_added(event: Atspi.Event) -> None:
+        # No filtramos por `event.source`: el registry manda el evento
+        # desde su nombre único y el objeto puede no ser el mismo que
+        # nos da `get_desktop`.
+        check()
+
+    def on_poll() -> bool:
+        nonlocal polling
+        polling = check()
+        return polling
+
+    def on_timeout() -> bool:
+        nonlocal timed_out
+        timed_out = True
+        loop.quit()
+        return False
+
+    # El listener se registra antes de la primera búsqueda para no
+    # perder el evento si la aplicación aparece justo entre medias.
+    listener = Atspi.EventListener.new(on_app_added)
+    listener.register(_APP_ADDED_EVENT)
+    try:
+        app = _find_app(desktop, name)
         if app is None:
-            time.sleep(0.6)
+            poll_id = GLib.timeout_add(_APP_POLL_INTERVAL, on_poll)
+            timeout_id = GLib.timeout_add(int((timeout or 5) * 1000), on_timeout)
+            loop.run()
+            if polling:
+                GLib.source_remove(poll_id)
+            if not timed_out:
+                GLib.source_remove(timeout_id)
+    finally:
+        listener.deregister(_APP_ADDED_EVENT)
     return app
 
 
 App = tuple[subprocess.Popen, Optional[Atspi.Object]]
 
+
+# Aplicaciones lanzadas con `reuse=True`. Nos ahorramos arrancar la
+# aplicación y esperar a que aparezca en el desktop en cada test.
+# Cada entrada guarda el instante (`time.monotonic`) a partir del cual
+# la aplicación ha caducado.
+_APP_POOL: dict[tuple[str, Optional[str]], tuple[subprocess.Popen, Atspi.Object, float]] = {}
+
+_APP_POOL_TTL = 60
+
+
+def _kill(process: subprocess.Popen) -> None:
+    process.kill()
+    process.wait()
+
+
+def _expire_pooled_apps() -> None:
+    now = time.monotonic()
+    for key, (process, _app, deadline) in list(_APP_POOL.items()):
+        if process.poll() is not None or now > deadline:
+            _kill(process)
+            del _APP_POOL[key]
+
+
+def _evict_pooled_name(name: str) -> None:
+    # En el desktop sólo se distingue a las aplicaciones por el
+    # nombre. Si dejamos la del pool, `_wait_for_app` la encontraría
+    # a ella en lugar de la nueva.
+    for key, (process, _app, _deadline) in list(_APP_POOL.items()):
+        if key[1] == name:
+            _kill(process)
+            del _APP_POOL[key]
+
+
+@atexit.register
+def _kill_pooled_apps() -> None:
+    for process, _app, _deadline in _APP_POOL.values():
+        _kill(process)
+    _APP_POOL.clear()
+
+
 def run(path: Union[str, Path],
         name: Optional[str]= None,
-        timeout: Optional[float]= None) -> App:
+        timeout: Optional[float]= None,
+        reuse: bool= False,
+        ttl: Optional[float]= None) -> App:
     """Runs the command in a new os process. Waits for application to
     appear in desktop.
 
@@ -661,6 +1146,22 @@ def run(path: Union[str, Path],
        The application's name that will be shown in the desktop.
        When no name is given, the function will forge one.
 
+    timeout : float, optional
+       Seconds to wait for the application to appear in the desktop.
+       Defaults to 5 seconds.
+
+    reuse : bool, optional
+       When True, the application is kept running and returned again
+       by later calls with the same `path` and `name`, instead of
+       starting a new one. The state of the application is not reset,
+       so use it only for tests that don't depend on it. The caller
+       must not kill the process, it's killed when it expires or at
+       exit.
+
+    ttl : float, optional
+       Seconds a reused application is kept running. Defaults to 60
+       seconds.
+
     Returns
     -------
     (subprocess.Popen, Atspi.Object)
@@ -673,9 +1174,20 @@ def run(path: Union[str, Path],
 
     """
     
+    key = (str(path), name)
+    _expire_pooled_apps()
+    if reuse and key in _APP_POOL:
+        process, app, _deadline = _APP_POOL[key]
+        return (process, app)
+    if name is not None:
+        _evict_pooled_name(name)
+    
     name = name or f"{path}-test-{str(random.randint(0, 100000000))}"
     process = subprocess.Popen([path, '--name', name])
     app = _wait_for_app(name, timeout)
+    if reuse and app is not None:
+        ttl = ttl if ttl is not None else _APP_POOL_TTL
+        _APP_POOL[key] = (process, app, time.monotonic() + ttl)
     return (process, app)
 
 
@@ -710,26 +1222,26 @@ def dump_app(name: str) -> None:
     """
     
     desktop = Atspi.get_desktop(0)
-    apps = [app for app in obj_children(desktop) if app and app.get_name() == name]
-    if len(apps) == 0:
+    app = _find_app(desktop, name)
+    if app is None:
         print(f"App {name} not found in desktop")
         print(f"Try running {__file__} without args to get the list of apps")
         sys.exit(0)
-    app = apps[0]
-    for path, node in tree_walk(app):
-        interfaces = node.get_interfaces()
-        try:
-            idx = interfaces.index('Action')
-            n = node.get_n_actions()
-            actions = [node.get_action_name(i) for i in range(n)]
-            interfaces[idx] = f"Action({','.join(actions)})"
-        except ValueError:
-            pass
-        role_name = node.get_role_name()
-        name = node.get_name() or ""
-        draw_1 = "".join("  " if nth_of.is_last() else "│ " for nth_of in path[:-1])
-        draw_2 = "└ " if path[-1].is_last() else "├ "
-        print(f"{draw_1}{draw_2}{role_name}({name}) {interfaces}")
+    with traversal_cache():
+        for path, node in tree_walk(app):
+            interfaces = node.get_interfaces()
+            try:
+                idx = interfaces.index('Action')
+                n = node.get_n_actions()
+                actions = [node.get_action_name(i) for i in range(n)]
+                interfaces[idx] = f"Action({','.join(actions)})"
+            except ValueError:
+                pass
+            role_name = obj_get_attr(node, 'role')
+            name = obj_get_attr(node, 'name')
+            draw_1 = "".join("  " if nth_of.is_last() else "│ " for nth_of in path[:-1])
+            draw_2 = "└ " if path[-1].is_last() else "├ "
+            print(f"{draw_1}{draw_2}{role_name}({name}) {interfaces}")
 
 
 def main() -> None: